@@ -1,6 +1,61 @@
 #!/usr/bin/env python3
+import hashlib
+import json
+import os
 import sys
-import xml.etree.ElementTree as ET
+
+# lxml parses and serializes large schemes much faster; the stdlib API is a drop-in fallback
+try:
+    from lxml import etree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+
+ENV_KEYS = ('SPEECH_KEY', 'SPEECH_REGION')
+
+
+def env_digest(values):
+    # Only a digest is cached so the key never lands in a second file
+    return hashlib.sha256('\0'.join(values).encode('utf-8')).hexdigest()
+
+
+def cache_is_current(cache_path, scheme_path, digest):
+    try:
+        with open(cache_path) as f:
+            cache = json.load(f)
+        st = os.stat(scheme_path)
+    except (OSError, ValueError):
+        return False
+    return cache == {'mtime': st.st_mtime, 'size': st.st_size, 'digest': digest}
+
+
+def write_cache(cache_path, scheme_path, digest):
+    st = os.stat(scheme_path)
+    try:
+        with open(cache_path, 'w') as f:
+            json.dump({'mtime': st.st_mtime, 'size': st.st_size, 'digest': digest}, f)
+    except OSError:
+        pass
+
+
+def launch_env_values(scheme_path):
+    # Stream the scheme for {key: (value, isEnabled)} under the first LaunchAction.
+    # Elements are cleared as they end and reading stops once the LaunchAction
+    # closes. The file is opened here so the early break still closes it.
+    values = {}
+    stack = []
+    with open(scheme_path, 'rb') as f:
+        for event, elem in ET.iterparse(f, events=('start', 'end')):
+            if event == 'start':
+                stack.append(elem.tag)
+                if stack[-3:] == ['LaunchAction', 'EnvironmentVariables', 'EnvironmentVariable']:
+                    values[elem.get('key')] = (elem.get('value'), elem.get('isEnabled'))
+                continue
+            stack.pop()
+            elem.clear()
+            if elem.tag == 'LaunchAction':
+                break
+    return values
+
 
 def main():
     if len(sys.argv) < 4:
@@ -8,6 +63,21 @@ def main():
         sys.exit(1)
 
     scheme_path, key, region = sys.argv[1], sys.argv[2], sys.argv[3]
+
+    # Skip parsing entirely if this scheme already holds these values from a previous run
+    cache_path = scheme_path + '.envcache'
+    digest = env_digest((key, region))
+    if cache_is_current(cache_path, scheme_path, digest):
+        print(f"{scheme_path} already has these env vars.")
+        return
+
+    # A streaming read is enough when the scheme already holds these values
+    current = launch_env_values(scheme_path)
+    if all(current.get(name) == (value, 'YES') for name, value in zip(ENV_KEYS, (key, region))):
+        write_cache(cache_path, scheme_path, digest)
+        print(f"{scheme_path} already has these env vars.")
+        return
+
     tree = ET.parse(scheme_path)
     root = tree.getroot()
 
@@ -20,18 +90,22 @@ def main():
     if envs is None:
         envs = ET.SubElement(launch, 'EnvironmentVariables')
 
+    # Index existing entries once so each upsert is a dict lookup
+    index = {var.get('key'): var for var in envs.findall('EnvironmentVariable')}
+
     def upsert(name, value):
-        for var in envs.findall('EnvironmentVariable'):
-            if var.get('key') == name:
-                var.set('value', value)
-                var.set('isEnabled', 'YES')
-                return
-        ET.SubElement(envs, 'EnvironmentVariable', key=name, value=value, isEnabled='YES')
+        if name in index:
+            var = index[name]
+            var.set('value', value)
+            var.set('isEnabled', 'YES')
+        else:
+            index[name] = ET.SubElement(envs, 'EnvironmentVariable', key=name, value=value, isEnabled='YES')
 
-    upsert('SPEECH_KEY', key)
-    upsert('SPEECH_REGION', region)
+    for name, value in zip(ENV_KEYS, (key, region)):
+        upsert(name, value)
 
-    tree.write(scheme_path, encoding='utf-8')
+    tree.write(scheme_path, encoding='utf-8', xml_declaration=True)
+    write_cache(cache_path, scheme_path, digest)
     print(f"Updated {scheme_path} with env vars.")
 
 if __name__ == '__main__':
@@ -4,10 +4,74 @@ import sys
 import os
 from pathlib import Path
 
-from transcriber import ConversationTranscriber
-from generator import ConversationGenerator, MarkdownToAudio
+# Mode-specific modules (Azure SDK, rich live output) are imported per subcommand in main()
 from utils import setup_logging
 
+def run(mode, input_file=None, output=None, duration=60, speakers=3, topic=None,
+        config='config.yaml', verbose=False):
+    """Run one operation mode in-process and return an exit code"""
+    # Check Azure credentials
+    if mode in ['microphone', 'file', 'generate']:
+        if not os.environ.get('AZURE_SPEECH_KEY') or not os.environ.get('AZURE_SPEECH_REGION'):
+            print("Error: Azure Speech credentials not found!")
+            print("Please set AZURE_SPEECH_KEY and AZURE_SPEECH_REGION environment variables.")
+            print("See README.md for setup instructions.")
+            return 1
+    
+    try:
+        if mode == 'microphone':
+            from transcriber import ConversationTranscriber
+            transcriber = ConversationTranscriber()
+            print("Starting microphone transcription...")
+            print("Press Ctrl+C to stop")
+            transcriber.transcribe_from_microphone(output_file=output)
+            
+        elif mode == 'file':
+            from transcriber import ConversationTranscriber
+            if not Path(input_file).exists():
+                print(f"Error: Input file '{input_file}' not found")
+                return 1
+            transcriber = ConversationTranscriber()
+            print(f"Transcribing from file: {input_file}")
+            transcriber.transcribe_from_file(input_file, output_file=output)
+            
+        elif mode == 'random':
+            from generator import ConversationGenerator
+            generator = ConversationGenerator()
+            output_path = output or 'conversation.md'
+            print(f"Generating {duration}s conversation with {speakers} speakers...")
+            generator.generate_random_conversation(
+                duration=duration,
+                num_speakers=speakers,
+                topic=topic,
+                output_file=output_path
+            )
+            print(f"Conversation saved to: {output_path}")
+            
+        elif mode == 'generate':
+            from generator import MarkdownToAudio
+            if not Path(input_file).exists():
+                print(f"Error: Input file '{input_file}' not found")
+                return 1
+            converter = MarkdownToAudio(config_file=config)
+            output_path = output or 'output.wav'
+            print(f"Converting markdown to audio: {input_file}")
+            converter.convert_to_audio(input_file, output_path)
+            print(f"Audio saved to: {output_path}")
+            
+        else:
+            print(f"Error: Unknown mode '{mode}'")
+            return 1
+            
+    except Exception as e:
+        print(f"\nError: {e}")
+        if verbose:
+            import traceback
+            traceback.print_exc()
+        return 1
+    
+    return 0
+
 def main():
     parser = argparse.ArgumentParser(
         description='Voice Conversation Transcriber with Speaker Diarization',
@@ -15,133 +79,121 @@ def main():
         epilog="""
 Examples:
   # Transcribe from microphone
-  %(prog)s --mode microphone
+  %(prog)s microphone
   
   # Transcribe from audio file
-  %(prog)s --mode file --input meeting.wav
+  %(prog)s file --input meeting.wav
   
   # Generate random conversation
-  %(prog)s --mode random --duration 60 --output conversation.md
+  %(prog)s random --duration 60 --output conversation.md
   
   # Convert markdown to audio
-  %(prog)s --mode generate --input conversation.md --output audio.wav
+  %(prog)s generate --input conversation.md --output audio.wav
         """
     )
     
-    parser.add_argument(
-        '--mode', 
-        choices=['microphone', 'file', 'random', 'generate'],
+    # Options shared by every mode
+    common = argparse.ArgumentParser(add_help=False)
+    
+    common.add_argument(
+        '--output', 
+        type=str,
+        help='Output file path'
+    )
+    
+    common.add_argument(
+        '--verbose', 
+        action='store_true',
+        help='Enable verbose logging'
+    )
+    
+    subparsers = parser.add_subparsers(
+        dest='mode',
         required=True,
-        help='Operation mode'
+        metavar='mode',
+        help='Operation mode: microphone, file, random or generate'
     )
     
-    parser.add_argument(
-        '--input', 
-        type=str,
-        help='Input file path (for file/generate modes)'
+    subparsers.add_parser(
+        'microphone',
+        parents=[common],
+        help='Transcribe from the default microphone'
     )
     
-    parser.add_argument(
-        '--output', 
+    file_parser = subparsers.add_parser(
+        'file',
+        parents=[common],
+        help='Transcribe a WAV file'
+    )
+    file_parser.add_argument(
+        '--input', 
         type=str,
-        help='Output file path'
+        required=True,
+        help='Input WAV file path'
     )
     
-    parser.add_argument(
+    random_parser = subparsers.add_parser(
+        'random',
+        parents=[common],
+        help='Generate a random markdown conversation'
+    )
+    random_parser.add_argument(
         '--duration', 
         type=int,
         default=60,
         help='Duration in seconds for random conversation (default: 60)'
     )
-    
-    parser.add_argument(
+    random_parser.add_argument(
         '--speakers', 
         type=int,
         default=3,
         help='Number of speakers for random conversation (default: 3)'
     )
-    
-    parser.add_argument(
+    random_parser.add_argument(
         '--topic', 
         type=str,
         help='Topic for random conversation'
     )
     
-    parser.add_argument(
+    generate_parser = subparsers.add_parser(
+        'generate',
+        parents=[common],
+        help='Convert a markdown conversation to audio'
+    )
+    generate_parser.add_argument(
+        '--input', 
+        type=str,
+        required=True,
+        help='Input markdown file path'
+    )
+    generate_parser.add_argument(
         '--config', 
         type=str,
         default='config.yaml',
         help='Configuration file path (default: config.yaml)'
     )
     
-    parser.add_argument(
-        '--verbose', 
-        action='store_true',
-        help='Enable verbose logging'
-    )
-    
     args = parser.parse_args()
     
     # Setup logging
     setup_logging(verbose=args.verbose)
     
-    # Validate arguments
-    if args.mode in ['file', 'generate'] and not args.input:
-        parser.error(f"--input is required for {args.mode} mode")
-    
-    # Check Azure credentials
-    if args.mode in ['microphone', 'file', 'generate']:
-        if not os.environ.get('AZURE_SPEECH_KEY') or not os.environ.get('AZURE_SPEECH_REGION'):
-            print("Error: Azure Speech credentials not found!")
-            print("Please set AZURE_SPEECH_KEY and AZURE_SPEECH_REGION environment variables.")
-            print("See README.md for setup instructions.")
-            sys.exit(1)
-    
+    # Ctrl+C is handled here rather than in run() so in-process callers see it
     try:
-        if args.mode == 'microphone':
-            transcriber = ConversationTranscriber()
-            print("Starting microphone transcription...")
-            print("Press Ctrl+C to stop")
-            transcriber.transcribe_from_microphone(output_file=args.output)
-            
-        elif args.mode == 'file':
-            if not Path(args.input).exists():
-                print(f"Error: Input file '{args.input}' not found")
-                sys.exit(1)
-            transcriber = ConversationTranscriber()
-            print(f"Transcribing from file: {args.input}")
-            transcriber.transcribe_from_file(args.input, output_file=args.output)
-            
-        elif args.mode == 'random':
-            generator = ConversationGenerator()
-            output_path = args.output or 'conversation.md'
-            print(f"Generating {args.duration}s conversation with {args.speakers} speakers...")
-            generator.generate_random_conversation(
-                duration=args.duration,
-                num_speakers=args.speakers,
-                topic=args.topic,
-                output_file=output_path
-            )
-            print(f"Conversation saved to: {output_path}")
-            
-        elif args.mode == 'generate':
-            if not Path(args.input).exists():
-                print(f"Error: Input file '{args.input}' not found")
-                sys.exit(1)
-            converter = MarkdownToAudio(config_file=args.config)
-            output_path = args.output or 'output.wav'
-            print(f"Converting markdown to audio: {args.input}")
-            converter.convert_to_audio(args.input, output_path)
-            print(f"Audio saved to: {output_path}")
-            
+        exit_code = run(
+            args.mode,
+            input_file=getattr(args, 'input', None),
+            output=args.output,
+            duration=getattr(args, 'duration', 60),
+            speakers=getattr(args, 'speakers', 3),
+            topic=getattr(args, 'topic', None),
+            config=getattr(args, 'config', 'config.yaml'),
+            verbose=args.verbose
+        )
     except KeyboardInterrupt:
         print("\n\nTranscription stopped by user")
-    except Exception as e:
-        print(f"\nError: {e}")
-        if args.verbose:
-            import traceback
-            traceback.print_exc()
-        sys.exit(1)
+        exit_code = 0
+    sys.exit(exit_code)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
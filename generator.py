@@ -1,143 +1,192 @@
 import os
-import random
-import azure.cognitiveservices.speech as speechsdk
-from datetime import datetime
-import yaml
+import copy
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import re
 from pathlib import Path
+from xml.sax.saxutils import escape, quoteattr
 import wave
-import struct
-from pydub import AudioSegment
-from pydub.silence import split_on_silence
-from pydub.utils import which
 
-# Set ffmpeg path if installed via homebrew
-if not which("ffmpeg"):
-    homebrew_ffmpeg = "/opt/homebrew/bin/ffmpeg"
-    if os.path.exists(homebrew_ffmpeg):
-        AudioSegment.converter = homebrew_ffmpeg
+# Parsed voice configs keyed by absolute path -> (mtime, size, speakers)
+_YAML_CACHE = OrderedDict()
+_YAML_CACHE_SIZE = 100
+
+# Concurrent Azure synthesis requests; the work is network-bound
+MAX_TTS_WORKERS = 8
+
+# Riff24Khz16BitMonoPcm: a 44-byte RIFF header followed by raw PCM
+SAMPLE_RATE = 24000
+SAMPLE_WIDTH = 2
+CHANNELS = 1
+WAV_HEADER_SIZE = 44
+
+# Pause inserted between utterances
+PAUSE_MS = 300
+
+# Utterances per SSML request; Azure allows at most 50 <voice> elements per document
+SSML_BATCH_SIZE = 50
+
+# "Speaker: text" lines in a markdown conversation
+_SPEAKER_RE = re.compile(r'^([A-Za-z]+):\s*(.+)$')
+
+TOPICS = {
+    'product launch': (
+        "Let's discuss the timeline for our new product launch.",
+        "The marketing team needs at least two weeks for the campaign.",
+        "What about the technical requirements?",
+        "We should be ready for beta testing next week.",
+        "I'm concerned about the user interface changes.",
+        "Those are minor tweaks, shouldn't delay us.",
+        "Have we considered the international markets?",
+        "Yes, localization is already in progress.",
+        "What's our contingency plan if we hit delays?",
+        "We have a buffer built into the schedule."
+    ),
+    'team meeting': (
+        "Good morning everyone, let's get started.",
+        "First, let's review last week's progress.",
+        "I completed the API integration as planned.",
+        "Great! Any blockers we should discuss?",
+        "I'm waiting on design specs for the dashboard.",
+        "I'll get those to you by end of day.",
+        "How's the testing going?",
+        "Found a few edge cases, but nothing critical.",
+        "Let's schedule a follow-up for Friday.",
+        "Sounds good, same time works for me."
+    ),
+    'technical debugging': (
+        "The system is throwing timeout errors again.",
+        "When did this start happening?",
+        "About an hour ago, right after the deployment.",
+        "Did we change any configuration settings?",
+        "Just updated the connection pool size.",
+        "That might be it. Let's check the logs.",
+        "I'm seeing a lot of connection refused errors.",
+        "Try rolling back the config change.",
+        "Okay, reverting now.",
+        "Errors stopped. That was definitely the issue."
+    ),
+    'project planning': (
+        "We need to define our Q2 objectives.",
+        "I think we should focus on performance improvements.",
+        "What about the new features customers requested?",
+        "We could tackle both with the right prioritization.",
+        "Let's list everything and assign complexity scores.",
+        "Good idea. I'll create a planning document.",
+        "We should also consider technical debt.",
+        "Agreed. The codebase needs some refactoring.",
+        "How many engineers can we dedicate to this?",
+        "I'd say three full-time, plus part-time support."
+    )
+}
+
+SPEAKER_NAMES = (
+    'Alice', 'Bob', 'Charlie', 'Diana', 'Emma', 
+    'Frank', 'Grace', 'Henry', 'Iris', 'Jack'
+)
+
+TRANSITIONS = (
+    "By the way,",
+    "Speaking of which,",
+    "That reminds me,",
+    "Also,",
+    "On another note,",
+    "Quick question -",
+    "Before I forget,",
+    "One more thing,",
+)
+
+# Word counts only feed the duration estimate, so compute them once
+TOPIC_WORD_COUNTS = {
+    topic: tuple(len(u.split()) for u in utterances)
+    for topic, utterances in TOPICS.items()
+}
+TRANSITION_WORD_COUNTS = tuple(len(t.split()) for t in TRANSITIONS)
 
 class ConversationGenerator:
     def __init__(self):
-        self.topics = {
-            'product launch': [
-                "Let's discuss the timeline for our new product launch.",
-                "The marketing team needs at least two weeks for the campaign.",
-                "What about the technical requirements?",
-                "We should be ready for beta testing next week.",
-                "I'm concerned about the user interface changes.",
-                "Those are minor tweaks, shouldn't delay us.",
-                "Have we considered the international markets?",
-                "Yes, localization is already in progress.",
-                "What's our contingency plan if we hit delays?",
-                "We have a buffer built into the schedule."
-            ],
-            'team meeting': [
-                "Good morning everyone, let's get started.",
-                "First, let's review last week's progress.",
-                "I completed the API integration as planned.",
-                "Great! Any blockers we should discuss?",
-                "I'm waiting on design specs for the dashboard.",
-                "I'll get those to you by end of day.",
-                "How's the testing going?",
-                "Found a few edge cases, but nothing critical.",
-                "Let's schedule a follow-up for Friday.",
-                "Sounds good, same time works for me."
-            ],
-            'technical debugging': [
-                "The system is throwing timeout errors again.",
-                "When did this start happening?",
-                "About an hour ago, right after the deployment.",
-                "Did we change any configuration settings?",
-                "Just updated the connection pool size.",
-                "That might be it. Let's check the logs.",
-                "I'm seeing a lot of connection refused errors.",
-                "Try rolling back the config change.",
-                "Okay, reverting now.",
-                "Errors stopped. That was definitely the issue."
-            ],
-            'project planning': [
-                "We need to define our Q2 objectives.",
-                "I think we should focus on performance improvements.",
-                "What about the new features customers requested?",
-                "We could tackle both with the right prioritization.",
-                "Let's list everything and assign complexity scores.",
-                "Good idea. I'll create a planning document.",
-                "We should also consider technical debt.",
-                "Agreed. The codebase needs some refactoring.",
-                "How many engineers can we dedicate to this?",
-                "I'd say three full-time, plus part-time support."
-            ]
-        }
-        
-        self.speaker_names = [
-            'Alice', 'Bob', 'Charlie', 'Diana', 'Emma', 
-            'Frank', 'Grace', 'Henry', 'Iris', 'Jack'
-        ]
+        self.topics = TOPICS
+        self.speaker_names = SPEAKER_NAMES
+        self.transitions = TRANSITIONS
         
-        self.transitions = [
-            "By the way,",
-            "Speaking of which,",
-            "That reminds me,",
-            "Also,",
-            "On another note,",
-            "Quick question -",
-            "Before I forget,",
-            "One more thing,",
-        ]
+        import numpy as np
+        self._rng = np.random.default_rng()
     
     def generate_random_conversation(self, duration=60, num_speakers=3, topic=None, output_file='conversation.md'):
+        rng = self._rng
+        
         # Select topic
         if topic and topic in self.topics:
             selected_topic = topic
         else:
-            selected_topic = random.choice(list(self.topics.keys()))
+            topics = list(self.topics.keys())
+            selected_topic = topics[rng.integers(len(topics))]
         
         # Select speakers
-        speakers = random.sample(self.speaker_names, min(num_speakers, len(self.speaker_names)))
+        if num_speakers < 0:
+            raise ValueError("Number of speakers must not be negative")
+        num_speakers = min(num_speakers, len(self.speaker_names))
+        speakers = [self.speaker_names[i] for i in rng.permutation(len(self.speaker_names))[:num_speakers].tolist()]
         
         # Estimate words needed (150 words per minute average speaking rate)
         target_words = int(duration * 150 / 60)
         
         # Generate conversation
         conversation = []
-        utterances = self.topics[selected_topic].copy()
-        random.shuffle(utterances)
+        utterances = self.topics[selected_topic]
+        word_counts = TOPIC_WORD_COUNTS[selected_topic]
+        order = rng.permutation(len(utterances)).tolist()
+        
+        transitions = self.transitions
+        transition_word_counts = TRANSITION_WORD_COUNTS
+        
+        # Every utterance adds at least min(word_counts) words, which bounds the
+        # loop; draw all random choices for it in a few vectorized calls
+        max_utts = max(0, target_words) // min(word_counts) + 1
+        speaker_idx = rng.integers(len(speakers), size=max_utts).tolist()
+        utt_idx = rng.integers(len(utterances), size=max_utts).tolist()
+        transition_coin = (rng.random(max_utts) < 0.3).tolist()
+        trans_idx = rng.integers(len(transitions), size=max_utts).tolist()
         
         word_count = 0
-        utterance_index = 0
         
-        while word_count < target_words:
-            speaker = random.choice(speakers)
+        for i in range(max_utts):
+            if word_count >= target_words:
+                break
             
-            if utterance_index < len(utterances):
-                text = utterances[utterance_index]
-                utterance_index += 1
+            if i < len(order):
+                idx = order[i]
+                text = utterances[idx]
+                words = word_counts[idx]
             else:
                 # Generate variations or transitions
-                if random.random() < 0.3 and conversation:
+                idx = utt_idx[i]
+                if transition_coin[i] and conversation:
                     # Add a transition
-                    transition = random.choice(self.transitions)
-                    base_utterance = random.choice(utterances)
-                    text = f"{transition} {base_utterance.lower()}"
+                    t = trans_idx[i]
+                    text = f"{transitions[t]} {utterances[idx].lower()}"
+                    words = transition_word_counts[t] + word_counts[idx]
                 else:
                     # Reuse with slight variations
-                    text = random.choice(utterances)
+                    text = utterances[idx]
+                    words = word_counts[idx]
             
             conversation.append({
-                'speaker': speaker,
+                'speaker': speakers[speaker_idx[i]],
                 'text': text
             })
             
-            word_count += len(text.split())
+            word_count += words
         
-        # Write to markdown file
-        with open(output_file, 'w') as f:
-            f.write(f"# Conversation: {selected_topic.title()}\n")
-            f.write(f"# Duration: ~{duration} seconds\n\n")
-            
-            for entry in conversation:
-                f.write(f"{entry['speaker']}: {entry['text']}\n\n")
+        # Write to markdown file in a single call
+        parts = [
+            f"# Conversation: {selected_topic.title()}\n",
+            f"# Duration: ~{duration} seconds\n\n"
+        ]
+        parts.extend(f"{entry['speaker']}: {entry['text']}\n\n" for entry in conversation)
+        Path(output_file).write_text(''.join(parts), encoding='utf-8')
         
         return output_file
 
@@ -150,6 +199,18 @@ class MarkdownToAudio:
         if not self.speech_key or not self.speech_region:
             raise ValueError("Azure Speech credentials not found in environment variables")
         
+        import azure.cognitiveservices.speech as speechsdk
+        
+        # One speech config shared by every synthesizer; the voice is chosen per request in SSML
+        self._speech_config = speechsdk.SpeechConfig(
+            subscription=self.speech_key,
+            region=self.speech_region
+        )
+        self._speech_config.set_speech_synthesis_output_format(
+            speechsdk.SpeechSynthesisOutputFormat.Riff24Khz16BitMonoPcm
+        )
+        self._local = threading.local()
+        
         # Load voice configuration
         self.voice_config = self._load_voice_config(config_file)
         
@@ -164,36 +225,75 @@ class MarkdownToAudio:
         ]
     
     def _load_voice_config(self, config_file):
-        if Path(config_file).exists():
-            with open(config_file, 'r') as f:
-                config = yaml.safe_load(f)
-                return config.get('speakers', {})
-        return {}
+        path = os.path.abspath(config_file)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return {}
+        
+        # Reuse the parsed config while the file is unchanged on disk
+        cached = _YAML_CACHE.get(path)
+        if cached and cached[:2] == (st.st_mtime, st.st_size):
+            _YAML_CACHE.move_to_end(path)
+            return copy.deepcopy(cached[2])
+        
+        speakers = self._read_config(path, st).get('speakers', {})
+        
+        _YAML_CACHE[path] = (st.st_mtime, st.st_size, speakers)
+        _YAML_CACHE.move_to_end(path)
+        if len(_YAML_CACHE) > _YAML_CACHE_SIZE:
+            _YAML_CACHE.popitem(last=False)
+        return copy.deepcopy(speakers)
+    
+    def _read_config(self, path, st):
+        # A JSON sidecar recorded against this exact (mtime, size) skips the YAML
+        # parser; comparing for equality also catches an older file restored
+        # with its timestamp preserved
+        sidecar = path + '.json'
+        try:
+            with open(sidecar, 'r') as f:
+                cached = json.load(f)
+            if (cached['mtime'], cached['size']) == (st.st_mtime, st.st_size):
+                return cached['config']
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        
+        # Imported here so modes that never read the config don't pay for PyYAML;
+        # prefer the libyaml-backed loader when PyYAML was built with it
+        import yaml
+        try:
+            from yaml import CSafeLoader as SafeLoader
+        except ImportError:
+            from yaml import SafeLoader
+        
+        with open(path, 'r') as f:
+            config = yaml.load(f, Loader=SafeLoader) or {}
+        
+        # Write the sidecar atomically; a read-only directory just means no cache
+        tmp = sidecar + '.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                json.dump({'mtime': st.st_mtime, 'size': st.st_size, 'config': config}, f)
+            os.replace(tmp, sidecar)
+        except (OSError, TypeError):
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return config
     
     def _parse_markdown(self, markdown_file):
         conversation = []
         
         with open(markdown_file, 'r') as f:
-            lines = f.readlines()
-        
-        # Skip header lines
-        in_conversation = False
-        for line in lines:
-            line = line.strip()
-            
-            if not line:
-                continue
-            
-            # Look for speaker: text pattern
-            match = re.match(r'^([A-Za-z]+):\s*(.+)$', line)
-            if match:
-                speaker = match.group(1)
-                text = match.group(2)
-                conversation.append({
-                    'speaker': speaker,
-                    'text': text
-                })
-                in_conversation = True
+            for raw in f:
+                line = raw.strip()
+                
+                # Header and blank lines don't match the speaker: text pattern
+                match = _SPEAKER_RE.match(line)
+                if match:
+                    conversation.append({
+                        'speaker': match.group(1),
+                        'text': match.group(2)
+                    })
         
         return conversation
     
@@ -203,33 +303,65 @@ class MarkdownToAudio:
         else:
             return self.default_voices[speaker_index % len(self.default_voices)]
     
-    def _text_to_speech(self, text, voice_name, output_file):
-        speech_config = speechsdk.SpeechConfig(
-            subscription=self.speech_key,
-            region=self.speech_region
-        )
-        speech_config.speech_synthesis_voice_name = voice_name
-        
-        # Set output format to wav
-        speech_config.set_speech_synthesis_output_format(
-            speechsdk.SpeechSynthesisOutputFormat.Riff24Khz16BitMonoPcm
-        )
+    def _get_synthesizer(self):
+        # Synthesizers are reused across utterances, one per worker thread
+        synthesizer = getattr(self._local, 'synthesizer', None)
+        if synthesizer is None:
+            import azure.cognitiveservices.speech as speechsdk
+            synthesizer = speechsdk.SpeechSynthesizer(
+                speech_config=self._speech_config,
+                audio_config=None
+            )
+            
+            # Bookmark offsets mark where each utterance starts in a batch
+            bookmarks = []
+            synthesizer.bookmark_reached.connect(lambda evt: bookmarks.append(evt.audio_offset))
+            self._local.synthesizer = synthesizer
+            self._local.bookmarks = bookmarks
+        return synthesizer
+    
+    def _build_ssml(self, entries):
+        # One <voice> element per utterance, each after the first opening with a bookmark
+        parts = ['<speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis" xml:lang="en-US">']
+        for n, (voice_name, text) in enumerate(entries):
+            mark = f'<bookmark mark="{n}"/>' if n else ''
+            parts.append(f'<voice name={quoteattr(voice_name)}>{mark}{escape(text)}</voice>')
+        parts.append('</speak>')
+        return ''.join(parts)
+    
+    def _text_to_speech(self, entries):
+        import azure.cognitiveservices.speech as speechsdk
         
-        # Create synthesizer with file output
-        audio_config = speechsdk.audio.AudioOutputConfig(filename=output_file)
-        synthesizer = speechsdk.SpeechSynthesizer(
-            speech_config=speech_config,
-            audio_config=audio_config
-        )
+        synthesizer = self._get_synthesizer()
+        bookmarks = self._local.bookmarks
+        bookmarks.clear()
         
-        # Generate speech
-        result = synthesizer.speak_text_async(text).get()
+        # Generate speech straight into memory and keep only the PCM samples
+        result = synthesizer.speak_ssml_async(self._build_ssml(entries)).get()
         
-        if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
-            return True
-        else:
+        if result.reason != speechsdk.ResultReason.SynthesizingAudioCompleted:
             print(f"Speech synthesis failed: {result.reason}")
-            return False
+            if len(entries) > 1:
+                # Retry per utterance so one bad request doesn't drop the whole batch
+                return self._text_to_speech_each(entries)
+            return None
+        pcm = result.audio_data[WAV_HEADER_SIZE:]
+        
+        if len(bookmarks) != len(entries) - 1:
+            # Can't tell utterances apart, so fall back to one request per utterance
+            return self._text_to_speech_each(entries)
+        
+        # Bookmark offsets are in 100ns ticks; convert to frame-aligned byte offsets
+        frame_size = SAMPLE_WIDTH * CHANNELS
+        bounds = [0]
+        bounds.extend(tick * SAMPLE_RATE // 10_000_000 * frame_size for tick in sorted(bookmarks))
+        bounds.append(len(pcm))
+        return [pcm[start:end] for start, end in zip(bounds, bounds[1:])]
+    
+    def _text_to_speech_each(self, entries):
+        # Per-entry results; None marks only the utterances that failed
+        segments = [self._text_to_speech([entry]) for entry in entries]
+        return [s[0] if s else None for s in segments]
     
     def convert_to_audio(self, markdown_file, output_file):
         # Parse conversation
@@ -238,53 +370,55 @@ class MarkdownToAudio:
         if not conversation:
             raise ValueError("No conversation found in markdown file")
         
-        # Track speakers
+        # Assign voices up front so the speaker -> voice mapping is stable
         speakers = {}
-        audio_segments = []
-        
-        print(f"Generating audio for {len(conversation)} utterances...")
-        
-        # Generate audio for each utterance
-        for i, entry in enumerate(conversation):
+        keys = []
+        for entry in conversation:
             speaker = entry['speaker']
-            text = entry['text']
-            
-            # Assign voice to speaker
             if speaker not in speakers:
-                speaker_index = len(speakers)
-                speakers[speaker] = self._get_voice_for_speaker(speaker, speaker_index)
-            
-            voice = speakers[speaker]
-            
-            # Generate temporary audio file
-            temp_file = f"temp_{i}.wav"
-            print(f"  [{i+1}/{len(conversation)}] {speaker}: {text[:50]}...")
-            
-            if self._text_to_speech(text, voice, temp_file):
-                # Load audio segment
-                audio = AudioSegment.from_wav(temp_file)
-                
-                # Add small pause between speakers (300ms)
-                if i > 0:
-                    silence = AudioSegment.silent(duration=300)
-                    audio_segments.append(silence)
-                
-                audio_segments.append(audio)
-                
-                # Clean up temp file
-                os.remove(temp_file)
+                speakers[speaker] = self._get_voice_for_speaker(speaker, len(speakers))
+            keys.append((speakers[speaker], entry['text']))
+        
+        # Repeated (voice, text) pairs are synthesized once; the rest are
+        # batched into multi-voice SSML documents, one request each
+        unique = list(dict.fromkeys(keys))
+        batches = [unique[start:start + SSML_BATCH_SIZE] for start in range(0, len(unique), SSML_BATCH_SIZE)]
+        
+        print(f"Generating audio for {len(conversation)} utterances "
+              f"({len(unique)} unique) in {len(batches)} request(s)...")
+        
+        # Synthesize batches concurrently
+        audio_cache = {}
+        with ThreadPoolExecutor(max_workers=min(MAX_TTS_WORKERS, len(batches))) as executor:
+            futures = {
+                executor.submit(self._text_to_speech, batch): b
+                for b, batch in enumerate(batches)
+            }
+            for future in as_completed(futures):
+                b = futures[future]
+                segments = future.result()
+                if segments:
+                    audio_cache.update(
+                        (key, pcm) for key, pcm in zip(batches[b], segments) if pcm is not None
+                    )
+                print(f"  [{b+1}/{len(batches)}] {len(batches[b])} utterances")
+        
+        pcm_segments = []
+        for key, entry in zip(keys, conversation):
+            if key in audio_cache:
+                pcm_segments.append(audio_cache[key])
             else:
-                print(f"Failed to generate audio for: {speaker}: {text}")
+                print(f"Failed to generate audio for: {entry['speaker']}: {entry['text']}")
         
-        # Combine all segments
+        # Combine all segments in one pass, with a small pause between speakers
         print("Combining audio segments...")
-        if audio_segments:
-            combined = audio_segments[0]
-            for segment in audio_segments[1:]:
-                combined += segment
-            
-            # Export final audio
-            combined.export(output_file, format="wav")
+        if pcm_segments:
+            silence = b'\x00' * (SAMPLE_WIDTH * CHANNELS * SAMPLE_RATE * PAUSE_MS // 1000)
+            with wave.open(output_file, 'wb') as wav:
+                wav.setnchannels(CHANNELS)
+                wav.setsampwidth(SAMPLE_WIDTH)
+                wav.setframerate(SAMPLE_RATE)
+                wav.writeframes(silence.join(pcm_segments))
             print(f"Audio saved to: {output_file}")
         else:
-            raise ValueError("No audio segments were generated")
\ No newline at end of file
+            raise ValueError("No audio segments were generated")
@@ -6,11 +6,104 @@ Tests the full cycle: generate MD -> convert to audio -> transcribe back -> comp
 
 import os
 import sys
-import subprocess
+import io
 import re
+import contextlib
+from collections import Counter
 from pathlib import Path
 from datetime import datetime
-import difflib
+from rapidfuzz.distance import Indel
+
+import conversation_transcriber
+
+# Markdown lines: speaker is a single word (no spaces)
+_MD_RE = re.compile(r'^([A-Za-z]+):\s*(.+)$')
+# Transcript lines: [timestamp] Speaker: text
+_TS_RE = re.compile(r'\[[\d:]+\]\s*([^:]+):\s*(.+)')
+# Speaker names at the start of each markdown line
+_SPEAKER_RE = re.compile(r'^([A-Za-z]+):', re.MULTILINE)
+
+# Minimum utterance similarity counted as a match
+MATCH_THRESHOLD = 0.7
+# Above this many utterance pairs, score them in parallel
+PARALLEL_MIN_PAIRS = 50
+# Longer utterances skip the quadratic fuzzy match
+FUZZY_MAX_CHARS = 2000
+
+def _trim_common(a, b):
+    """Strip the common prefix and suffix; return both residuals"""
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    j = 0
+    while j < n - i and a[-1 - j] == b[-1 - j]:
+        j += 1
+    return a[i:len(a) - j], b[i:len(b) - j]
+
+def _quick_similarity(a, b):
+    """Score pairs that don't need a fuzzy match; None means run the scorer"""
+    if a == b:
+        return 1.0
+    # Even a perfect alignment can't match more than the shorter string
+    if 2 * min(len(a), len(b)) / (len(a) + len(b)) < MATCH_THRESHOLD:
+        return 0.0
+    # Very long utterances: compare word multisets (Jaccard) in linear time
+    if max(len(a), len(b)) > FUZZY_MAX_CHARS:
+        words_a, words_b = Counter(a.split()), Counter(b.split())
+        union = sum((words_a | words_b).values())
+        return sum((words_a & words_b).values()) / union if union else 0.0
+    return None
+
+def _similarity(a, b):
+    """Indel similarity of a and b, computed on the residual after trimming"""
+    quick = _quick_similarity(a, b)
+    if quick is not None:
+        return quick
+    total = len(a) + len(b)
+    a_rest, b_rest = _trim_common(a, b)
+    # The trimmed characters are part of an optimal alignment, so the residual's
+    # edit distance is the distance for the full strings
+    return 1.0 - Indel.distance(a_rest, b_rest) / total
+
+def _score_pairs(orig_texts, trans_texts):
+    """Similarity for each (original, transcribed) pair, in order"""
+    if len(orig_texts) <= PARALLEL_MIN_PAIRS:
+        return [_similarity(a, b) for a, b in zip(orig_texts, trans_texts)]
+    
+    # Long transcripts: settle the easy pairs here and score the rest on all
+    # cores; cpdist compares element-wise, unlike cdist's full matrix
+    from rapidfuzz.process import cpdist
+    scores = [_quick_similarity(a, b) for a, b in zip(orig_texts, trans_texts)]
+    pending = [i for i, score in enumerate(scores) if score is None]
+    if pending:
+        fuzzy = cpdist(
+            [orig_texts[i] for i in pending],
+            [trans_texts[i] for i in pending],
+            scorer=Indel.normalized_similarity,
+            dtype='float64',
+            workers=-1
+        )
+        for i, score in zip(pending, fuzzy.tolist()):
+            scores[i] = score
+    return scores
+
+class _HeadBuffer(io.TextIOBase):
+    """Text sink that keeps only the first `limit` characters written to it"""
+    def __init__(self, limit):
+        self.limit = limit
+        self.parts = []
+        self.size = 0
+        
+    def write(self, s):
+        if self.size < self.limit:
+            head = s[:self.limit - self.size]
+            self.parts.append(head)
+            self.size += len(head)
+        return len(s)
+        
+    def getvalue(self):
+        return ''.join(self.parts)
 
 class TestRunner:
     def __init__(self):
@@ -39,47 +132,42 @@ class TestRunner:
             print(f"❌ FAIL: {message}")
         self.test_results.append((success, message))
         
-    def run_command(self, cmd):
-        """Run a command and capture output"""
-        print(f"Running: {' '.join(cmd)}")
-        try:
-            result = subprocess.run(
-                cmd, 
-                capture_output=True, 
-                text=True, 
-                check=True
-            )
-            print(f"Output: {result.stdout[:200]}..." if len(result.stdout) > 200 else f"Output: {result.stdout}")
-            if result.stderr:
-                print(f"Stderr: {result.stderr}")
-            return True, result.stdout
-        except subprocess.CalledProcessError as e:
-            print(f"Error: {e}")
-            print(f"Stdout: {e.stdout}")
-            print(f"Stderr: {e.stderr}")
-            return False, e.stderr
+    def run_step(self, mode, capture=False, **kwargs):
+        """Run a transcriber mode in-process, optionally capturing the head of its output"""
+        print(f"Running: {mode} {' '.join(f'{k}={v}' for k, v in kwargs.items())}")
+        if capture:
+            buffer = _HeadBuffer(4096)
+            with contextlib.redirect_stdout(buffer):
+                exit_code = conversation_transcriber.run(mode, **kwargs)
+            output = buffer.getvalue()
+            print(f"Output: {output[:200]}..." if len(output) > 200 else f"Output: {output}")
+        else:
+            # Let output stream straight to the terminal rather than buffering it
+            exit_code = conversation_transcriber.run(mode, **kwargs)
+            output = ''
+        if exit_code != 0:
+            print(f"Error: {mode} exited with status {exit_code}")
+        return exit_code == 0, output
             
     def test_random_generation(self):
         """Test 1: Generate random conversation"""
         self.print_step(1, "Generate Random Conversation (20 seconds)")
         
-        cmd = [
-            "python", "conversation_transcriber.py",
-            "--mode", "random",
-            "--duration", "20",
-            "--speakers", "3",
-            "--output", str(self.md_file)
-        ]
-        
-        success, _ = self.run_command(cmd)
+        success, _ = self.run_step(
+            'random',
+            capture=True,
+            duration=20,
+            speakers=3,
+            output=str(self.md_file)
+        )
         
         if success and self.md_file.exists():
-            content = self.md_file.read_text()
+            content = self.md_file.read_bytes().decode('utf-8')
             print(f"\nGenerated conversation preview:")
             print(content[:300] + "..." if len(content) > 300 else content)
             
             # Parse speakers from generated conversation
-            speakers = set(re.findall(r'^([A-Za-z]+):', content, re.MULTILINE))
+            speakers = {m.group(1) for m in _SPEAKER_RE.finditer(content)}
             self.print_result(len(speakers) >= 2, f"Generated conversation has {len(speakers)} speakers")
             return True, speakers
         else:
@@ -94,14 +182,11 @@ class TestRunner:
             self.print_result(False, "Markdown file doesn't exist")
             return False
             
-        cmd = [
-            "python", "conversation_transcriber.py",
-            "--mode", "generate",
-            "--input", str(self.md_file),
-            "--output", str(self.audio_file)
-        ]
-        
-        success, _ = self.run_command(cmd)
+        success, _ = self.run_step(
+            'generate',
+            input_file=str(self.md_file),
+            output=str(self.audio_file)
+        )
         
         if success and self.audio_file.exists():
             file_size = self.audio_file.stat().st_size
@@ -119,17 +204,14 @@ class TestRunner:
             self.print_result(False, "Audio file doesn't exist")
             return False
             
-        cmd = [
-            "python", "conversation_transcriber.py",
-            "--mode", "file",
-            "--input", str(self.audio_file),
-            "--output", str(self.transcript_file)
-        ]
-        
-        success, _ = self.run_command(cmd)
+        success, _ = self.run_step(
+            'file',
+            input_file=str(self.audio_file),
+            output=str(self.transcript_file)
+        )
         
         if success and self.transcript_file.exists():
-            content = self.transcript_file.read_text()
+            content = self.transcript_file.read_bytes().decode('utf-8')
             print(f"\nTranscribed conversation preview:")
             print(content[:300] + "..." if len(content) > 300 else content)
             self.print_result(True, "Transcription completed")
@@ -142,30 +224,14 @@ class TestRunner:
         """Parse conversation from text format"""
         conversations = []
         
-        # Try to parse markdown format
-        # Only match lines where speaker is a single word (no spaces)
-        md_pattern = r'^([A-Za-z]+):\s*(.+)$'
-        for line in text.split('\n'):
-            # Skip header lines and metadata
-            if line.startswith('#') or 'Duration:' in line or line.strip() == '':
+        # Markdown lines (Speaker: text) and transcript lines ([timestamp] Speaker: text)
+        # never match each other's pattern, so one pass handles both formats
+        for line in text.splitlines():
+            # Skip header lines, metadata and empty lines
+            stripped = line.lstrip()
+            if not stripped or stripped[0] == '#' or 'Duration:' in stripped:
                 continue
-            match = re.match(md_pattern, line)
-            if match:
-                speaker, utterance = match.groups()
-                conversations.append({
-                    'speaker': speaker.strip(),
-                    'text': utterance.strip()
-                })
-        if conversations:
-            return conversations
-            
-        # Try to parse transcript format [timestamp] Speaker: text
-        transcript_pattern = r'\[[\d:]+\]\s*([^:]+):\s*(.+)'
-        for line in text.split('\n'):
-            # Skip header lines and empty lines
-            if line.startswith('#') or line.strip() == '':
-                continue
-            match = re.match(transcript_pattern, line)
+            match = _MD_RE.match(line) or _TS_RE.match(line)
             if match:
                 speaker, utterance = match.groups()
                 conversations.append({
@@ -173,19 +239,17 @@ class TestRunner:
                     'text': utterance.strip()
                 })
         return conversations
-            
-        return conversations
         
     def compare_conversations(self, original_speakers):
         """Test 4: Compare original and transcribed conversations"""
         self.print_step(4, "Compare Original and Transcribed Conversations")
         
         # Read original markdown
-        original_text = self.md_file.read_text()
+        original_text = self.md_file.read_bytes().decode('utf-8')
         original_conv = self.parse_conversation(original_text)
         
         # Read transcribed text
-        transcript_text = self.transcript_file.read_text()
+        transcript_text = self.transcript_file.read_bytes().decode('utf-8')
         transcript_conv = self.parse_conversation(transcript_text)
         
         print(f"\nOriginal conversation: {len(original_conv)} utterances")
@@ -197,8 +261,10 @@ class TestRunner:
         if len(transcript_conv) > 0:
             print(f"First transcribed entry: {transcript_conv[0]}")
         
-        # Create speaker mapping (original -> transcribed)
+        # Create speaker mapping (original -> transcribed); mapped_trans mirrors
+        # its values for constant-time lookups
         speaker_map = {}
+        mapped_trans = set()
         
         # Check if we have enough data to compare
         if len(transcript_conv) == 0:
@@ -209,28 +275,20 @@ class TestRunner:
             self.print_result(False, "No original conversation found")
             return False
         
-        # Compare utterances
-        matches = 0
+        # Lowercase each side once, score every utterance pair in one pass, then report
         total = min(len(original_conv), len(transcript_conv))
+        orig_lc = [entry['text'].lower() for entry in original_conv[:total]]
+        trans_lc = [entry['text'].lower() for entry in transcript_conv[:total]]
+        scores = _score_pairs(orig_lc, trans_lc)
+        matches = sum(score > MATCH_THRESHOLD for score in scores)
         
-        for i in range(total):
-            orig = original_conv[i]
-            trans = transcript_conv[i]
-            
+        for i, (orig, trans, similarity) in enumerate(zip(original_conv, transcript_conv, scores)):
             # Map speakers
-            if orig['speaker'] not in speaker_map:
-                # Try to find matching speaker based on utterance similarity
-                if trans['speaker'] not in speaker_map.values():
-                    speaker_map[orig['speaker']] = trans['speaker']
-            
-            # Compare text (fuzzy matching)
-            similarity = difflib.SequenceMatcher(None, 
-                orig['text'].lower(), 
-                trans['text'].lower()
-            ).ratio()
+            if orig['speaker'] not in speaker_map and trans['speaker'] not in mapped_trans:
+                speaker_map[orig['speaker']] = trans['speaker']
+                mapped_trans.add(trans['speaker'])
             
-            if similarity > 0.7:  # 70% similarity threshold
-                matches += 1
+            if similarity > MATCH_THRESHOLD:
                 print(f"✓ Match {i+1}: {similarity:.1%} similar")
             else:
                 print(f"✗ Mismatch {i+1}: {similarity:.1%} similar")
@@ -26,13 +26,6 @@ def test_imports():
         print(f"✗ NumPy: {e}")
         return False
     
-    try:
-        from pydub import AudioSegment
-        print("✓ PyDub")
-    except ImportError as e:
-        print(f"✗ PyDub: {e}")
-        return False
-    
     try:
         import colorama
         print("✓ Colorama")
@@ -54,6 +47,13 @@ def test_imports():
         print(f"✗ PyYAML: {e}")
         return False
     
+    try:
+        from rapidfuzz import fuzz
+        print("✓ RapidFuzz")
+    except ImportError as e:
+        print(f"✗ RapidFuzz: {e}")
+        return False
+    
     return True
 
 def test_azure_credentials():
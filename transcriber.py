@@ -1,17 +1,19 @@
 import os
-import azure.cognitiveservices.speech as speechsdk
 import threading
-import time
 from datetime import datetime
+from pathlib import Path
+from typing import NamedTuple
 from rich.console import Console
-from rich.live import Live
-from rich.table import Table
-from rich.text import Text
-import wave
 import json
 
 console = Console()
 
+class Entry(NamedTuple):
+    ts: datetime
+    speaker: str
+    text: str
+    speaker_id: str
+
 class ConversationTranscriber:
     def __init__(self):
         self.speech_key = os.environ.get('AZURE_SPEECH_KEY')
@@ -22,17 +24,34 @@ class ConversationTranscriber:
         
         self.speakers = {}
         self.transcript = []
-        self.is_transcribing = False
+        self._done = threading.Event()
         self.colors = ['red', 'green', 'blue', 'yellow', 'magenta', 'cyan']
         self.speaker_colors = {}
+        self._speaker_text = {}
+        
+        # Live table, kept between refreshes; _table_count is how many transcript
+        # entries it has already seen
+        self._table = None
+        self._table_count = 0
         
     def _get_speaker_color(self, speaker_id):
-        if speaker_id not in self.speaker_colors:
-            color_index = len(self.speaker_colors) % len(self.colors)
-            self.speaker_colors[speaker_id] = self.colors[color_index]
-        return self.speaker_colors[speaker_id]
+        color = self.speaker_colors.get(speaker_id)
+        if color is None:
+            from rich.text import Text
+            color = self.colors[len(self.speaker_colors) % len(self.colors)]
+            self.speaker_colors[speaker_id] = color
+            # Styled label reused by every table redraw
+            self._speaker_text[speaker_id] = Text(speaker_id, style=color)
+        return color
+    
+    def _get_speaker_text(self, speaker_id):
+        if speaker_id not in self._speaker_text:
+            self._get_speaker_color(speaker_id)
+        return self._speaker_text[speaker_id]
     
     def _create_conversation_recognizer(self, audio_config):
+        import azure.cognitiveservices.speech as speechsdk
+        
         speech_config = speechsdk.SpeechConfig(
             subscription=self.speech_key, 
             region=self.speech_region
@@ -51,22 +70,33 @@ class ConversationTranscriber:
             audio_config=audio_config
         )
     
-    def _display_transcript(self):
+    def _new_table(self):
+        from rich.table import Table
+        
         table = Table(title="Live Transcription", show_header=True, header_style="bold magenta")
         table.add_column("Time", style="dim", width=12)
         table.add_column("Speaker", width=12)
         table.add_column("Text", width=60)
-        
-        # Show last 10 entries
-        for entry in self.transcript[-10:]:
-            time_str = entry['timestamp'].strftime("%H:%M:%S")
-            speaker_color = self._get_speaker_color(entry['speaker'])
-            speaker_text = Text(entry['speaker'], style=speaker_color)
-            table.add_row(time_str, speaker_text, entry['text'])
-        
         return table
     
+    def _display_transcript(self):
+        # Refreshes with no new entries return the existing table untouched
+        new_entries = self.transcript[self._table_count:]
+        if self._table is None or self._table.row_count + len(new_entries) > 10:
+            # Rich tables can't drop rows, so start over from the last 10 entries
+            self._table = self._new_table()
+            new_entries = self.transcript[-10:]
+        
+        for entry in new_entries:
+            time_str = entry.ts.strftime("%H:%M:%S")
+            self._table.add_row(time_str, self._get_speaker_text(entry.speaker), entry.text)
+        self._table_count = len(self.transcript)
+        
+        return self._table
+    
     def _handle_transcribed(self, evt):
+        import azure.cognitiveservices.speech as speechsdk
+        
         if evt.result.reason == speechsdk.ResultReason.RecognizedSpeech:
             speaker_id = evt.result.speaker_id or "Unknown"
             
@@ -77,22 +107,19 @@ class ConversationTranscriber:
             speaker_label = self.speakers[speaker_id]
             
             # Add to transcript
-            self.transcript.append({
-                'timestamp': datetime.now(),
-                'speaker': speaker_label,
-                'text': evt.result.text,
-                'speaker_id': speaker_id
-            })
+            self.transcript.append(Entry(datetime.now(), speaker_label, evt.result.text, speaker_id))
             
             # Print to console with color
             color = self._get_speaker_color(speaker_label)
             console.print(f"[{color}]{speaker_label}:[/{color}] {evt.result.text}")
     
     def _handle_session_stopped(self, evt):
-        self.is_transcribing = False
+        self._done.set()
         console.print("\n[bold green]Transcription completed[/bold green]")
     
     def transcribe_from_microphone(self, output_file=None):
+        import azure.cognitiveservices.speech as speechsdk
+        
         audio_config = speechsdk.audio.AudioConfig(use_default_microphone=True)
         conversation_transcriber = self._create_conversation_recognizer(audio_config)
         
@@ -102,15 +129,17 @@ class ConversationTranscriber:
         conversation_transcriber.canceled.connect(self._handle_session_stopped)
         
         # Start transcription
-        self.is_transcribing = True
+        self._done.clear()
         conversation_transcriber.start_transcribing_async().get()
         
         console.print("[bold green]Transcription started. Speak into your microphone...[/bold green]")
         console.print("[dim]Press Ctrl+C to stop[/dim]\n")
         
+        # Wait with a timeout so Ctrl+C is delivered on every platform (a bare
+        # Event.wait() can't be interrupted on Windows)
         try:
-            while self.is_transcribing:
-                time.sleep(0.1)
+            while not self._done.wait(0.5):
+                pass
         except KeyboardInterrupt:
             pass
         
@@ -123,11 +152,13 @@ class ConversationTranscriber:
     
     def transcribe_from_file(self, audio_file, output_file=None):
         # Validate file format
-        if not audio_file.endswith('.wav'):
+        if Path(audio_file).suffix.lower() != '.wav':
             console.print("[red]Error: Only WAV files are supported[/red]")
             return
         
-        audio_config = speechsdk.audio.AudioConfig(filename=audio_file)
+        import azure.cognitiveservices.speech as speechsdk
+        
+        audio_config = speechsdk.audio.AudioConfig(filename=str(audio_file))
         conversation_transcriber = self._create_conversation_recognizer(audio_config)
         
         # Connect callbacks
@@ -136,15 +167,15 @@ class ConversationTranscriber:
         conversation_transcriber.canceled.connect(self._handle_session_stopped)
         
         # Start transcription
-        self.is_transcribing = True
+        self._done.clear()
         conversation_transcriber.start_transcribing_async().get()
         
         console.print(f"[bold green]Transcribing file: {audio_file}[/bold green]")
         console.print("[dim]Processing...[/dim]\n")
         
         # Wait for completion
-        while self.is_transcribing:
-            time.sleep(0.1)
+        while not self._done.wait(0.5):
+            pass
         
         # Save transcript if requested
         if output_file:
@@ -153,23 +184,25 @@ class ConversationTranscriber:
     def _save_transcript(self, output_file):
         if output_file.endswith('.json'):
             # Save as JSON
-            with open(output_file, 'w') as f:
-                json_data = []
-                for entry in self.transcript:
-                    json_data.append({
-                        'timestamp': entry['timestamp'].isoformat(),
-                        'speaker': entry['speaker'],
-                        'text': entry['text']
-                    })
-                json.dump(json_data, f, indent=2)
+            json_data = [
+                {
+                    'timestamp': entry.ts.isoformat(),
+                    'speaker': entry.speaker,
+                    'text': entry.text
+                }
+                for entry in self.transcript
+            ]
+            Path(output_file).write_text(json.dumps(json_data, indent=2), encoding='utf-8')
         else:
-            # Save as text/markdown
-            with open(output_file, 'w') as f:
-                f.write(f"# Conversation Transcript\n")
-                f.write(f"# Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-                
-                for entry in self.transcript:
-                    time_str = entry['timestamp'].strftime("%H:%M:%S")
-                    f.write(f"[{time_str}] {entry['speaker']}: {entry['text']}\n\n")
+            # Save as text/markdown, built up front and written in one call
+            parts = [
+                "# Conversation Transcript\n",
+                f"# Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+            ]
+            parts.extend(
+                f"[{entry.ts.strftime('%H:%M:%S')}] {entry.speaker}: {entry.text}\n\n"
+                for entry in self.transcript
+            )
+            Path(output_file).write_text(''.join(parts), encoding='utf-8')
         
         console.print(f"\n[green]Transcript saved to: {output_file}[/green]")
\ No newline at end of file